@@ -1,15 +1,30 @@
+import hashlib
+import http.client
 import json
 import os
 import queue
 import re
+import shlex
 import shutil
+import stat
 import subprocess
+import sys
 import threading
 import time
 import tkinter as tk
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
+from itertools import groupby
 from pathlib import Path
 from tkinter import filedialog, messagebox, scrolledtext, ttk
+from urllib.parse import urlsplit
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle, repli sur json
+    orjson = None
 
 
 SYSTEM_PROMPT = """
@@ -23,6 +38,7 @@ Format attendu strictement:
     {"type": "append_file", "path": "...", "content": "..."},
     {"type": "read_file", "path": "..."},
     {"type": "run", "cmd": "..."},
+    {"type": "ask", "prompt": "..."},
     {"type": "done", "reason": "..."}
   ]
 }
@@ -31,9 +47,17 @@ Contraintes:
 - Ne jamais utiliser d'API distante.
 - Privilégier CMake pour C++ et pytest/unittest pour Python.
 - Corriger les erreurs de build/test dans les itérations suivantes.
+- Utiliser plusieurs actions ask pour des sous-tâches indépendantes: elles sont traitées en parallèle.
 """.strip()
 
 LOW_RAM_MODEL = "tinyllama:latest"
+OLLAMA_BASE_URL = "http://localhost:11434"
+LOG_MAX = 2000
+LOG_MAX_LINES = 5000
+BATCH_MAX_HANDLES = 64
+SHELL_METACHARS = frozenset("|&;<>()$`*?~!{}[]#\n" + ("%^" if os.name == "nt" else ""))
+LOC_EXTENSIONS = {"python": (".py",), "cpp": (".cpp", ".hpp", ".h", ".cc", ".cxx")}
+LOC_IGNORED_DIRS = frozenset({".git", "__pycache__", "build", ".venv", "venv", ".pytest_cache", "node_modules"})
 
 
 @dataclass
@@ -44,14 +68,194 @@ class AgentConfig:
     language: str = "python"
     max_iterations: int = 50
     target_loc: int = 250000
+    num_parallel: int = 2
+    persist_llm_cache: bool = False
 
 
-class LocalLLMClient:
-    """Client minimal pour appeler un LLM local via la CLI ollama."""
+def _loads_json(text: str):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _is_json_object(text: str) -> bool:
+    try:
+        return isinstance(_loads_json(text), dict)
+    except ValueError:
+        return False
+
+
+class JsonObjectScanner:
+    """Repère en un seul passage le premier objet `{...}` équilibré d'un texte, éventuellement reçu par morceaux."""
+
+    _TOKENS = re.compile(r'[{}"\\]')
+
+    def __init__(self):
+        self._parts: list[str] = []
+        self._size = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped_at = -1
+        self.start = -1
+        self.end = -1
+
+    @property
+    def complete(self) -> bool:
+        return self.end >= 0
+
+    def feed(self, chunk: str) -> bool:
+        """Ajoute un morceau de texte; renvoie True dès que l'objet est refermé."""
+        base = self._size
+        self._parts.append(chunk)
+        self._size += len(chunk)
+        if self.complete:
+            return True
+        return self._scan(chunk, base)
+
+    def resume(self) -> bool:
+        """Écarte l'objet repéré (JSON invalide) et reprend la recherche juste après; même retour que feed."""
+        offset = self.end
+        self.start = self.end = -1
+        self._depth = 0
+        self._in_string = False
+        self._escaped_at = -1
+        return self._scan(self.text[offset:], offset)
+
+    def _scan(self, chunk: str, base: int) -> bool:
+        for match in self._TOKENS.finditer(chunk):
+            pos = base + match.start()
+            if pos == self._escaped_at:
+                continue
+            token = match.group()
+            if self._in_string:
+                if token == "\\":
+                    self._escaped_at = pos + 1
+                elif token == '"':
+                    self._in_string = False
+            elif token == '"':
+                if self.start >= 0:
+                    self._in_string = True
+            elif token == "{":
+                if self.start < 0:
+                    self.start = pos
+                self._depth += 1
+            elif token == "}" and self.start >= 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = pos + 1
+                    return True
+        return False
+
+    @property
+    def text(self) -> str:
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def span(self) -> str | None:
+        if not self.complete:
+            return None
+        return self.text[self.start:self.end]
+
+
+class PromptCache:
+    """Cache exact des réponses LLM, indexé par clé, avec persistance JSONL optionnelle."""
+
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self._entries: dict[str, str] = {}
+        self._lock = threading.Lock()
+        if path is not None and path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry["response"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+
+    @staticmethod
+    def cache_key(model: str, prompt: str, system: str = "") -> str:
+        return hashlib.sha256(f"{model}\0{system}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        return self._entries.get(key)
+
+    def set(self, key: str, response: str):
+        with self._lock:
+            self._entries[key] = response
+            if self.path is not None:
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "response": response}, ensure_ascii=False) + "\n")
 
-    def __init__(self, model: str, timeout: int = 120):
+
+class LocalLLMClient:
+    """Client minimal pour appeler un LLM local via l'API HTTP d'ollama (repli sur la CLI)."""
+
+    def __init__(
+        self,
+        model: str,
+        timeout: int = 120,
+        base_url: str = OLLAMA_BASE_URL,
+        keep_alive: str = "1h",
+        num_ctx: int = 4096,
+        cache: PromptCache | None = None,
+    ):
         self.model = model
         self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.cache = cache
+        url = urlsplit(base_url)
+        self._host = url.hostname or "localhost"
+        self._port = url.port or 11434
+        self._local = threading.local()
+
+    @property
+    def _conn(self) -> http.client.HTTPConnection | None:
+        """Connexion persistante propre au thread courant (une par requête concurrente)."""
+        return getattr(self._local, "conn", None)
+
+    @_conn.setter
+    def _conn(self, conn: http.client.HTTPConnection | None):
+        self._local.conn = conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+        return self._conn
+
+    def _post_stream(self, path: str, payload: dict) -> http.client.HTTPResponse:
+        """POST JSON sur la connexion persistante (keep-alive), reconnectée une fois si le serveur l'a fermée.
+
+        La réponse est renvoyée non lue pour pouvoir consommer un flux NDJSON au fil de l'eau.
+        """
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        for attempt in range(2):
+            reused = self._conn is not None
+            conn = self._connection()
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                response = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if not reused or attempt:
+                    raise
+            except (http.client.HTTPException, OSError):
+                self.close()
+                raise
+
+        if response.status != 200:
+            detail = response.read().decode("utf-8", errors="replace").strip() or "Erreur inconnue"
+            raise RuntimeError(f"Échec appel LLM local (HTTP {response.status}): {detail}")
+        return response
 
     def ensure_model_ready(self, logger):
         """Vérifie la présence du modèle local et le télécharge automatiquement si nécessaire."""
@@ -92,7 +296,85 @@ class LocalLLMClient:
 
         logger(f"Téléchargement terminé: {self.model}")
 
-    def generate(self, prompt: str) -> str:
+    def generate(
+        self,
+        prompt: str,
+        system: str | None = None,
+        stop_at_json: bool = True,
+        use_cache: bool = True,
+    ) -> str:
+        """Génère une réponse; `system` est transmis à part pour que le serveur réutilise son cache KV.
+
+        `use_cache=False` pour les prompts qui ne peuvent pas se répéter (ex. plans par itération).
+        """
+        if self.cache is None or not use_cache:
+            return self._generate(prompt, system, stop_at_json)
+        key = PromptCache.cache_key(self.model, prompt, system or "")
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        response = self._generate(prompt, system, stop_at_json)
+        self.cache.set(key, response)
+        return response
+
+    def generate_many(self, prompts: list[str], max_workers: int = 2) -> list[str]:
+        """Envoie plusieurs prompts indépendants en parallèle (borné par OLLAMA_NUM_PARALLEL côté serveur)."""
+
+        def worker(prompt: str) -> str:
+            try:
+                return self.generate(prompt, stop_at_json=False)
+            finally:
+                self.close()
+
+        if len(prompts) <= 1 or max_workers <= 1:
+            return [self.generate(prompt, stop_at_json=False) for prompt in prompts]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as pool:
+            return list(pool.map(worker, prompts))
+
+    def _generate(self, prompt: str, system: str | None, stop_at_json: bool) -> str:
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": {"num_ctx": self.num_ctx},
+        }
+        if system:
+            payload["system"] = system
+        try:
+            response = self._post_stream("/api/generate", payload)
+        except TimeoutError as exc:
+            raise RuntimeError("Temps d'exécution du modèle local dépassé.") from exc
+        except (http.client.HTTPException, OSError):
+            return self._generate_cli(f"{system}\n\n{prompt}" if system else prompt)
+
+        scanner = JsonObjectScanner()
+        try:
+            for line in response:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if "error" in event:
+                    raise RuntimeError(f"Échec appel LLM local: {event['error']}")
+                complete = scanner.feed(event.get("response", ""))
+                while stop_at_json and complete:
+                    if _is_json_object(scanner.span()):
+                        # JSON complet: fermer la connexion interrompt la génération côté serveur.
+                        self.close()
+                        return scanner.span()
+                    complete = scanner.resume()
+                if event.get("done"):
+                    break
+            response.read()
+        except TimeoutError as exc:
+            self.close()
+            raise RuntimeError("Temps d'exécution du modèle local dépassé.") from exc
+        except (http.client.HTTPException, OSError, ValueError) as exc:
+            self.close()
+            raise RuntimeError(f"Flux LLM local interrompu: {exc}") from exc
+        return scanner.text.strip()
+
+    def _generate_cli(self, prompt: str) -> str:
         cmd = ["ollama", "run", self.model, prompt]
         try:
             result = subprocess.run(
@@ -113,17 +395,192 @@ class LocalLLMClient:
         return result.stdout.strip()
 
 
+def _count_text_lines(content: str) -> int:
+    return content.count("\n") + (1 if content and not content.endswith("\n") else 0)
+
+
+def _encode_text(content: str) -> bytes:
+    """Encode comme une écriture en mode texte: `\n` devient `os.linesep` (`\r\n` sous Windows)."""
+    if os.linesep != "\n":
+        content = content.replace("\n", os.linesep)
+    return content.encode("utf-8")
+
+
+def _count_file_lines(path: Path) -> tuple[int, bool]:
+    """Compte les lignes d'un fichier par blocs de 1 Mio, sans décoder ni découper le texte.
+
+    Renvoie aussi si le fichier se termine par un saut de ligne (vrai pour un fichier vide).
+    """
+    total = 0
+    last = b""
+    try:
+        with path.open("rb", buffering=0) as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                total += chunk.count(b"\n")
+                last = chunk
+    except OSError:
+        return 0, True
+    ends_with_newline = not last or last.endswith(b"\n")
+    return total + (0 if ends_with_newline else 1), ends_with_newline
+
+
+def _retry_writable(func, path, exc):
+    """Retire l'attribut lecture seule (fichiers .git sous Windows) puis relance la suppression."""
+    if isinstance(exc, tuple):  # onerror reçoit sys.exc_info(), onexc l'exception
+        exc = exc[1]
+    # Sous POSIX, un refus vient des droits du dossier parent: un chmod du fichier n'y change rien.
+    if os.name != "nt" or not isinstance(exc, PermissionError) or os.path.islink(path):
+        raise exc
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+# `onerror` est déprécié depuis Python 3.12 au profit de `onexc` (même rôle ici).
+_RMTREE_HANDLER = {"onexc" if sys.version_info >= (3, 12) else "onerror": _retry_writable}
+
+
+def _remove_path(path: Path):
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, **_RMTREE_HANDLER)
+    else:
+        try:
+            path.unlink()
+        except PermissionError as exc:
+            _retry_writable(os.unlink, path, exc)
+
+
+def _remove_tree(root: Path, max_workers: int = 8):
+    """Supprime un dossier en répartissant ses entrées de premier niveau sur plusieurs threads."""
+    if root.is_symlink():
+        # Même refus que shutil.rmtree: ne jamais vider la cible d'un lien.
+        raise OSError("Cannot call rmtree on a symbolic link")
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            list(pool.map(_remove_path, list(root.iterdir())))
+        root.rmdir()
+    except OSError:
+        # Contention ou verrou (fréquent sous Windows): on termine en série.
+        if root.exists():
+            shutil.rmtree(root, **_RMTREE_HANDLER)
+
+
 class WorkspaceExecutor:
     def __init__(self, root: Path, logger):
         self.root = root
         self.logger = logger
+        self._root_resolved = root.resolve()
+        self._loc_by_path: dict[Path, int] = {}
+        # (taille, mtime_ns, fin par saut de ligne) au moment du dernier comptage de chaque fichier.
+        self._loc_state: dict[Path, tuple[int, int, bool]] = {}
+        self._handles: dict[Path, int] | None = None
+        # Empreinte du dernier contenu écrit, avec (taille, mtime) pour détecter une modification externe.
+        self._content_hashes: dict[Path, tuple[bytes, int, int]] = {}
+        self._scan_loc()
+
+    def _scan_loc(self):
+        """Synchronise le comptage LOC avec le disque (au démarrage et après chaque run).
+
+        Seuls les fichiers nouveaux ou dont la taille/mtime a changé sont relus; les disparus sont retirés.
+        """
+        extensions = frozenset(ext for exts in LOC_EXTENSIONS.values() for ext in exts)
+        stamps: dict[Path, tuple[int, int]] = {}
+        for dirpath, dirnames, filenames in os.walk(self._root_resolved):
+            dirnames[:] = [d for d in dirnames if d not in LOC_IGNORED_DIRS]
+            base = Path(dirpath)
+            for name in filenames:
+                if os.path.splitext(name)[1].lower() in extensions:
+                    try:
+                        st = os.stat(base / name)
+                    except OSError:
+                        continue
+                    stamps[base / name] = (st.st_size, st.st_mtime_ns)
+        for path in self._loc_by_path.keys() - stamps.keys():
+            del self._loc_by_path[path]
+            self._loc_state.pop(path, None)
+        changed = [p for p, stamp in stamps.items() if self._loc_state.get(p, (None, None))[:2] != stamp]
+        if not changed:
+            return
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+            for path, (lines, ends_with_newline) in zip(changed, pool.map(_count_file_lines, changed)):
+                self._loc_by_path[path] = lines
+                self._loc_state[path] = (*stamps[path], ends_with_newline)
+
+    def _record_loc(self, path: Path, lines: int, ends_with_newline: bool):
+        st = os.stat(path)
+        self._loc_by_path[path] = lines
+        self._loc_state[path] = (st.st_size, st.st_mtime_ns, ends_with_newline)
+
+    def _loc_in_sync(self, path: Path) -> bool:
+        """Vrai si le fichier n'a pas changé sur disque depuis son dernier comptage."""
+        state = self._loc_state.get(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return state is not None and (st.st_size, st.st_mtime_ns) == state[:2]
+
+    def _tracks_loc(self, path: Path) -> bool:
+        """Même filtre que le scan initial: rien sous LOC_IGNORED_DIRS (build, .venv, ...)."""
+        return LOC_IGNORED_DIRS.isdisjoint(path.relative_to(self._root_resolved).parts[:-1])
 
     def _resolve(self, rel_path: str) -> Path:
-        safe = (self.root / rel_path).resolve()
-        if not str(safe).startswith(str(self.root.resolve())):
+        safe = (self._root_resolved / rel_path).resolve()
+        if not safe.is_relative_to(self._root_resolved):
             raise ValueError(f"Chemin hors workspace interdit: {rel_path}")
         return safe
 
+    @contextmanager
+    def begin_batch(self):
+        """Garde les fichiers écrits ouverts jusqu'à la sortie du bloc: un seul open/close par fichier."""
+        self._handles = {}
+        try:
+            yield self
+        finally:
+            self._close_handles()
+            self._handles = None
+
+    def _close_handles(self):
+        if self._handles:
+            for fd in self._handles.values():
+                os.close(fd)
+            self._handles.clear()
+
+    def _cached_fd(self, path: Path) -> int | None:
+        """Descripteur du lot pour `path`, s'il désigne toujours le même fichier (ni déplacé ni supprimé)."""
+        if self._handles is None or path not in self._handles:
+            return None
+        fd = self._handles[path]
+        try:
+            opened, current = os.fstat(fd), os.stat(path)
+            if (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino):
+                return fd
+        except OSError:
+            pass
+        os.close(self._handles.pop(path))
+        return None
+
+    def _write_bytes(self, path: Path, data: bytes, truncate: bool):
+        fd = self._cached_fd(path)
+        owned = fd is None
+        if owned:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0)
+            fd = os.open(path, flags, 0o666)
+            if self._handles is not None and len(self._handles) >= BATCH_MAX_HANDLES:
+                os.close(self._handles.pop(next(iter(self._handles))))
+        try:
+            if truncate:
+                os.ftruncate(fd, 0)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            if owned:
+                if self._handles is not None:
+                    self._handles[path] = fd
+                else:
+                    os.close(fd)
+
     def mkdir(self, rel_path: str):
         path = self._resolve(rel_path)
         path.mkdir(parents=True, exist_ok=True)
@@ -131,56 +588,89 @@ class WorkspaceExecutor:
 
     def write_file(self, rel_path: str, content: str):
         path = self._resolve(rel_path)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(content, encoding="utf-8")
+        data = _encode_text(content)
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if self._is_unchanged(path, digest):
+            self.logger(f"[write_file:skip-unchanged] {path}")
+            return
+        self._write_bytes(path, data, truncate=True)
+        st = path.stat()
+        self._content_hashes[path] = (digest, st.st_size, st.st_mtime_ns)
+        if self._tracks_loc(path):
+            self._record_loc(path, _count_text_lines(content), not content or content.endswith("\n"))
         self.logger(f"[write_file] {path} ({len(content)} chars)")
 
+    def _is_unchanged(self, path: Path, digest: bytes) -> bool:
+        known = self._content_hashes.get(path)
+        if known is None or known[0] != digest:
+            return False
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        return (st.st_size, st.st_mtime_ns) == known[1:]
+
     def append_file(self, rel_path: str, content: str):
         path = self._resolve(rel_path)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with path.open("a", encoding="utf-8") as f:
-            f.write(content)
+        in_sync = self._loc_in_sync(path)
+        self._write_bytes(path, _encode_text(content), truncate=False)
+        self._content_hashes.pop(path, None)
+        if not self._tracks_loc(path):
+            pass
+        elif in_sync:
+            # Une dernière ligne sans saut de ligne est prolongée par le texte ajouté, pas doublée.
+            lines = self._loc_by_path[path]
+            ends_with_newline = self._loc_state[path][2]
+            if content:
+                newlines = lines - (0 if ends_with_newline else 1) + content.count("\n")
+                ends_with_newline = content.endswith("\n")
+                lines = newlines + (0 if ends_with_newline else 1)
+            self._record_loc(path, lines, ends_with_newline)
+        else:
+            # Fichier inconnu ou modifié hors de l'agent: recompte complet.
+            self._record_loc(path, *_count_file_lines(path))
         self.logger(f"[append_file] {path} (+{len(content)} chars)")
 
-    def read_file(self, rel_path: str) -> str:
+    def read_file(self, rel_path: str, max_bytes: int = 65536) -> str:
         path = self._resolve(rel_path)
         if not path.exists():
             self.logger(f"[read_file] introuvable: {path}")
             return ""
-        content = path.read_text(encoding="utf-8", errors="replace")
+        with path.open("rb") as f:
+            data = f.read(max_bytes)
+        content = data.decode("utf-8", errors="replace")
         self.logger(f"[read_file] {path} ({len(content)} chars)")
         return content
 
     def run(self, command: str) -> str:
         self.logger(f"[run] {command}")
-        result = subprocess.run(
-            command,
-            shell=True,
-            cwd=self.root,
-            capture_output=True,
-            text=True,
-            check=False,
-        )
-        output = f"$ {command}\n{result.stdout}\n{result.stderr}".strip()
-        self.logger(f"[run:exit={result.returncode}]\n{output[:2000]}")
+        # La commande peut déplacer/supprimer des fichiers du lot (et Windows bloque les fichiers ouverts).
+        self._close_handles()
+        # Commande simple: exécution directe sans démarrer de shell; sinon (pipes, redirections...) shell=True.
+        use_shell = not SHELL_METACHARS.isdisjoint(command)
+        if not use_shell:
+            try:
+                words = command.split(None, 1)
+                if not words or "=" in words[0]:
+                    raise ValueError("affectation de variable ou commande vide")
+                args = command if os.name == "nt" else shlex.split(command)
+                proc = subprocess.Popen(args, cwd=self.root, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            except (OSError, ValueError):
+                use_shell = True
+        if use_shell:
+            proc = subprocess.Popen(
+                command, shell=True, cwd=self.root, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+            )
+        stdout, stderr = proc.communicate()
+        output = f"$ {command}\n{stdout}\n{stderr}".strip()
+        self.logger(f"[run:exit={proc.returncode}]\n{output}")
+        # La commande a pu créer, modifier ou supprimer des sources.
+        self._scan_loc()
         return output
 
     def count_loc(self, language: str) -> int:
-        ext_map = {"python": ".py", "cpp": (".cpp", ".hpp", ".h", ".cc", ".cxx")}
-        extensions = ext_map.get(language.lower(), ".py")
-        total = 0
-        for p in self.root.rglob("*"):
-            if p.is_file():
-                if isinstance(extensions, tuple):
-                    match = p.suffix.lower() in extensions
-                else:
-                    match = p.suffix.lower() == extensions
-                if match:
-                    try:
-                        total += len(p.read_text(encoding="utf-8", errors="ignore").splitlines())
-                    except Exception:
-                        continue
-        return total
+        extensions = LOC_EXTENSIONS.get(language.lower(), LOC_EXTENSIONS["python"])
+        return sum(n for p, n in self._loc_by_path.items() if p.suffix.lower() in extensions)
 
 
 class AutoDevAgent:
@@ -190,37 +680,110 @@ class AutoDevAgent:
         self.executor = executor
         self.logger = logger
         self.stop_requested = False
+        self.history: deque[tuple[int, str]] = deque(maxlen=20)
+        # Partie invariante du prompt, formatée une seule fois (préfixe stable pour le cache).
+        self._prompt_prefix = (
+            f"Langage cible: {config.language}\n"
+            f"Objectif LOC approximatif: {config.target_loc}\n"
+            f"Description utilisateur:\n{config.description}\n"
+        )
 
     def stop(self):
         self.stop_requested = True
 
     def _extract_json(self, raw: str) -> dict:
-        match = re.search(r"\{.*\}", raw, re.S)
-        if not match:
-            raise ValueError("Réponse LLM sans JSON exploitable.")
-        return json.loads(match.group(0))
-
-    def _build_prompt(self, iteration: int, history: str, last_output: str) -> str:
-        return f"""
-{SYSTEM_PROMPT}
+        scanner = JsonObjectScanner()
+        if scanner.feed(raw):
+            try:
+                return _loads_json(scanner.span())
+            except ValueError:
+                pass
+        decoder = json.JSONDecoder()
+        pos = raw.find("{")
+        while pos >= 0:
+            try:
+                plan, _ = decoder.raw_decode(raw, pos)
+            except ValueError:
+                plan = None
+            if isinstance(plan, dict):
+                return plan
+            pos = raw.find("{", pos + 1)
+        raise ValueError("Réponse LLM sans JSON exploitable.")
+
+    def _ask_many(self, prompts: list[str]) -> list:
+        """Traite toutes les actions ask d'un plan en un seul lot concurrent; une erreur remplace la réponse."""
+        if not prompts:
+            return []
+        try:
+            return self.llm.generate_many(prompts, max_workers=self.config.num_parallel)
+        except Exception as exc:
+            return [exc] * len(prompts)
 
+    def _attempt(self, a_type: str, func) -> str | None:
+        """Exécute une action; renvoie sa sortie (None si aucune) ou le message d'erreur."""
+        if self.stop_requested:
+            return None
+        try:
+            return func()
+        except Exception as exc:
+            err = f"Action {a_type} échouée: {exc}"
+            self.logger(err)
+            return err
+
+    def _do_mkdirs(self, actions: list[dict]) -> list:
+        return [self._attempt("mkdir", lambda: self.executor.mkdir(a["path"])) for a in actions]
+
+    def _do_writes(self, actions: list[dict]) -> list:
+        return [
+            self._attempt("write_file", lambda: self.executor.write_file(a["path"], a.get("content", "")))
+            for a in actions
+        ]
+
+    def _do_appends(self, actions: list[dict]) -> list:
+        return [
+            self._attempt("append_file", lambda: self.executor.append_file(a["path"], a.get("content", "")))
+            for a in actions
+        ]
+
+    def _do_reads(self, actions: list[dict]) -> list:
+        def read(action: dict) -> str:
+            # Seuls 5000 caractères sont repris: au plus 4 octets UTF-8 chacun.
+            content = self.executor.read_file(action["path"], max_bytes=20000)
+            return f"READ<{action['path']}>\n{content[:5000]}"
+
+        if len(actions) == 1:
+            return [self._attempt("read_file", lambda: read(actions[0]))]
+        # Lectures indépendantes: traitées en parallèle, sorties dans l'ordre du plan.
+        with ThreadPoolExecutor(max_workers=min(8, len(actions))) as pool:
+            return list(pool.map(lambda a: self._attempt("read_file", lambda: read(a)), actions))
+
+    def _do_runs(self, actions: list[dict]) -> list:
+        return [self._attempt("run", lambda: self.executor.run(a["cmd"])) for a in actions]
+
+    def _do_asks(self, actions: list[dict], answers) -> list:
+        def ask(action: dict, answer) -> str:
+            if isinstance(answer, Exception):
+                raise answer
+            self.logger(f"[ask] {action.get('prompt', '')[:200]}")
+            return f"ASK<{action.get('prompt', '')[:200]}>\n{answer[:5000]}"
+
+        return [self._attempt("ask", lambda: ask(a, next(answers))) for a in actions]
+
+    def _build_prompt(self, iteration: int, last_output: str) -> str:
+        history = "\n".join(f"Iteration {k}: {summary}" for k, summary in self.history)
+        return self._prompt_prefix + f"""
 Iteration: {iteration}/{self.config.max_iterations}
-Langage cible: {self.config.language}
-Objectif LOC approximatif: {self.config.target_loc}
-Description utilisateur:
-{self.config.description}
 
 Historique résumé:
-{history[-5000:]}
+{history}
 
 Dernière sortie build/test:
 {last_output[-4000:]}
 
-Renvoie UNIQUEMENT le JSON.
-""".strip()
+Renvoie UNIQUEMENT le JSON."""
 
     def run_cycle(self):
-        history = ""
+        self.history.clear()
         last_output = ""
         for i in range(1, self.config.max_iterations + 1):
             if self.stop_requested:
@@ -233,8 +796,9 @@ Renvoie UNIQUEMENT le JSON.
             if loc >= self.config.target_loc:
                 self.logger("Objectif de volume atteint. Passage en finalisation.")
 
-            prompt = self._build_prompt(i, history, last_output)
-            raw = self.llm.generate(prompt)
+            prompt = self._build_prompt(i, last_output)
+            # Le prompt de plan contient l'itération et l'historique: il ne se répète jamais, pas de cache.
+            raw = self.llm.generate(prompt, system=SYSTEM_PROMPT, use_cache=False)
             self.logger(f"[llm] réponse brute (extrait):\n{raw[:1200]}")
 
             try:
@@ -247,36 +811,42 @@ Renvoie UNIQUEMENT le JSON.
             summary = plan.get("summary", "(sans résumé)")
             actions = plan.get("actions", [])
             self.logger(f"[plan] {summary} | actions={len(actions)}")
-            history += f"\nIteration {i}: {summary}"
+            self.history.append((i, str(summary)[:250]))
 
-            iteration_output = []
+            # Seuls les ask atteignables sont envoyés: rien après un done, rien si un arrêt est demandé.
+            asks = []
             for action in actions:
-                if self.stop_requested:
+                if action.get("type") == "done":
                     break
-                a_type = action.get("type", "")
-                try:
-                    if a_type == "mkdir":
-                        self.executor.mkdir(action["path"])
-                    elif a_type == "write_file":
-                        self.executor.write_file(action["path"], action.get("content", ""))
-                    elif a_type == "append_file":
-                        self.executor.append_file(action["path"], action.get("content", ""))
-                    elif a_type == "read_file":
-                        content = self.executor.read_file(action["path"])
-                        iteration_output.append(f"READ<{action['path']}>\n{content[:5000]}")
-                    elif a_type == "run":
-                        out = self.executor.run(action["cmd"])
-                        iteration_output.append(out)
-                    elif a_type == "done":
-                        reason = action.get("reason", "Terminé.")
+                if action.get("type") == "ask":
+                    asks.append(action.get("prompt", ""))
+            answers = iter([] if self.stop_requested else self._ask_many(asks))
+
+            handlers = {
+                "mkdir": self._do_mkdirs,
+                "write_file": self._do_writes,
+                "append_file": self._do_appends,
+                "read_file": self._do_reads,
+                "run": self._do_runs,
+                "ask": lambda group: self._do_asks(group, answers),
+            }
+
+            iteration_output = []
+            with self.executor.begin_batch():
+                # Les actions consécutives de même type sont traitées en lot, dans l'ordre du plan.
+                for a_type, group in groupby(actions, key=lambda a: a.get("type", "")):
+                    if self.stop_requested:
+                        break
+                    group = list(group)
+                    if a_type == "done":
+                        reason = group[0].get("reason", "Terminé.")
                         self.logger(f"[done] {reason}")
                         return
-                    else:
+                    handler = handlers.get(a_type)
+                    if handler is None:
                         self.logger(f"Action inconnue ignorée: {a_type}")
-                except Exception as exc:
-                    err = f"Action {a_type} échouée: {exc}"
-                    self.logger(err)
-                    iteration_output.append(err)
+                        continue
+                    iteration_output.extend(out for out in handler(group) if out is not None)
 
             last_output = "\n\n".join(iteration_output)
 
@@ -291,7 +861,7 @@ class App(tk.Tk):
         self.worker = None
 
         self._build_ui()
-        self.after(200, self._drain_logs)
+        self.bind("<<LogArrived>>", lambda _event: self._drain_logs())
 
     def _build_ui(self):
         frm = ttk.Frame(self)
@@ -305,6 +875,8 @@ class App(tk.Tk):
         self.lang_var = tk.StringVar(value="python")
         self.iter_var = tk.StringVar(value="40")
         self.loc_var = tk.StringVar(value="250000")
+        self.parallel_var = tk.StringVar(value="2")
+        self.persist_cache_var = tk.BooleanVar(value=False)
 
         ttk.Label(top, text="Dossier projet:").grid(row=0, column=0, sticky="w", padx=4, pady=4)
         ttk.Entry(top, textvariable=self.project_var, width=70).grid(row=0, column=1, sticky="ew", padx=4, pady=4)
@@ -322,6 +894,12 @@ class App(tk.Tk):
         ttk.Label(top, text="Objectif LOC:").grid(row=2, column=1, sticky="e", padx=4, pady=4)
         ttk.Entry(top, textvariable=self.loc_var, width=12).grid(row=2, column=2, sticky="w", padx=4, pady=4)
 
+        ttk.Label(top, text="Requêtes ask simultanées (client):").grid(row=3, column=0, sticky="w", padx=4, pady=4)
+        ttk.Entry(top, textvariable=self.parallel_var, width=12).grid(row=3, column=1, sticky="w", padx=4, pady=4)
+        ttk.Checkbutton(top, text="Cache persistant des réponses ask (.llm_cache.jsonl)", variable=self.persist_cache_var).grid(
+            row=3, column=2, sticky="w", padx=4, pady=4
+        )
+
         top.columnconfigure(1, weight=1)
 
         desc_box = ttk.LabelFrame(frm, text="Description du programme à générer")
@@ -347,21 +925,37 @@ class App(tk.Tk):
             self.project_var.set(selected)
 
     def _log(self, msg: str):
+        if len(msg) > LOG_MAX:
+            msg = msg[:LOG_MAX] + f"...(+{len(msg) - LOG_MAX} chars)"
         self.queue.put(msg)
+        try:
+            # Appel sûr depuis le thread de l'agent: Tk le relaie à la boucle principale.
+            self.event_generate("<<LogArrived>>", when="tail")
+        except (tk.TclError, RuntimeError):
+            pass
 
     def _drain_logs(self):
-        while not self.queue.empty():
-            msg = self.queue.get_nowait()
+        msgs = []
+        try:
+            while True:
+                msgs.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        if msgs:
             ts = time.strftime("%H:%M:%S")
-            self.log_txt.insert("end", f"[{ts}] {msg}\n")
+            self.log_txt.insert("end", "".join(f"[{ts}] {msg}\n" for msg in msgs))
+            excess = int(self.log_txt.index("end-1c").split(".")[0]) - 1 - LOG_MAX_LINES
+            if excess > 0:
+                self.log_txt.delete("1.0", f"{excess + 1}.0")
             self.log_txt.see("end")
-        self.after(200, self._drain_logs)
 
     def _run_agent_thread(self, cfg: AgentConfig):
+        llm = None
         try:
             root = Path(cfg.project_dir)
             root.mkdir(parents=True, exist_ok=True)
-            llm = LocalLLMClient(cfg.model)
+            cache = PromptCache(root / ".llm_cache.jsonl" if cfg.persist_llm_cache else None)
+            llm = LocalLLMClient(cfg.model, cache=cache)
             llm.ensure_model_ready(self._log)
             executor = WorkspaceExecutor(root=root, logger=self._log)
             self.agent = AutoDevAgent(cfg, llm=llm, executor=executor, logger=self._log)
@@ -369,6 +963,9 @@ class App(tk.Tk):
             self._log("Cycle IA terminé.")
         except Exception as exc:
             self._log(f"Erreur fatale: {exc}")
+        finally:
+            if llm is not None:
+                llm.close()
 
     def start_agent(self):
         if self.worker and self.worker.is_alive():
@@ -388,9 +985,11 @@ class App(tk.Tk):
                 language=self.lang_var.get().strip(),
                 max_iterations=int(self.iter_var.get().strip()),
                 target_loc=int(self.loc_var.get().strip()),
+                num_parallel=max(1, int(self.parallel_var.get().strip())),
+                persist_llm_cache=self.persist_cache_var.get(),
             )
         except ValueError:
-            messagebox.showerror("Erreur", "Itérations et LOC doivent être des entiers.")
+            messagebox.showerror("Erreur", "Itérations, LOC et requêtes parallèles doivent être des entiers.")
             return
 
         self.worker = threading.Thread(target=self._run_agent_thread, args=(cfg,), daemon=True)
@@ -406,7 +1005,11 @@ class App(tk.Tk):
         project = Path(self.project_var.get().strip())
         if project.exists() and project.is_dir():
             if messagebox.askyesno("Confirmer", f"Supprimer le dossier {project} ?"):
-                shutil.rmtree(project)
+                try:
+                    _remove_tree(project)
+                except OSError as exc:
+                    self._log(f"Suppression impossible ({project}): {exc}")
+                    return
                 self._log(f"Projet supprimé: {project}")
 
 